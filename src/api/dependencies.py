@@ -1,9 +1,55 @@
 """
 Dependency injection for API services.
 """
+from typing import Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+
 from src.api.services import DocumentService, ChatSessionService, VectorStoreService
+from src.config import settings
+
+# Shared Redis connection pool for state that must be visible to all workers
+redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
 # Initialize services (singleton pattern)
 document_service = DocumentService()
-chat_service = ChatSessionService()
+chat_service = ChatSessionService(redis_client)
 vector_service = VectorStoreService()
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def json_body(model: Type[ModelT], optional: bool = False):
+    """
+    Build a dependency that validates the raw request body in a single pass
+    with model_validate_json, instead of parsing to a dict first
+    """
+
+    async def dependency(request: Request) -> ModelT:
+        body = await request.body()
+        if optional and not body:
+            return model()
+
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            )
+
+    return dependency
+
+
+def json_body_openapi(model: Type[BaseModel], optional: bool = False) -> dict:
+    """
+    OpenAPI request body for routes using json_body, which FastAPI cannot infer
+    """
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+            "required": not optional,
+        }
+    }
@@ -1,12 +1,13 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 # Query Models
 class QueryRequest(BaseModel):
     query: str = Field(..., description="User's question or query", min_length=1)
     k: int = Field(default=3, description="Number of similar documents to retrieve", ge=1, le=10)
+    stream: bool = Field(default=False, description="Stream the answer as server-sent events")
 
 
 class QueryResponse(BaseModel):
@@ -27,6 +28,7 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User's message", min_length=1)
     session_id: Optional[str] = Field(None, description="Chat session ID")
     k: int = Field(default=3, description="Number of context documents", ge=1, le=10)
+    stream: bool = Field(default=False, description="Stream the answer as server-sent events")
 
 
 class ChatResponse(BaseModel):
@@ -66,6 +68,9 @@ class DocumentMetadata(BaseModel):
     processed: bool = False
 
 
+DOC_LIST_ADAPTER = TypeAdapter(List[DocumentMetadata])
+
+
 class DocumentList(BaseModel):
     documents: List[DocumentMetadata]
     total: int
@@ -89,6 +94,9 @@ class SearchResult(BaseModel):
     score: Optional[float] = None
 
 
+SEARCH_LIST_ADAPTER = TypeAdapter(List[SearchResult])
+
+
 class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
@@ -1,34 +1,28 @@
 import time
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
 
-from src.api.models import (ChatRequest, ChatResponse, ChatSession, ChatHistory, ErrorResponse)
-from src.api.services import ChatSessionService, VectorStoreService
+from src.api.dependencies import chat_service, vector_service, json_body, json_body_openapi
+from src.api.models import (ChatRequest, ChatResponse, ChatSession, ChatHistory, ChatMessage, ErrorResponse)
+from src.api.streaming import answer_events
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
-# Dependencies
-def get_chat_service():
-    from src.api.dependencies import chat_service
-    return chat_service
-
-
-def get_vector_service():
-    from src.api.dependencies import vector_service
-    return vector_service
-
-
-@router.post("", response_model=ChatResponse, responses={500: {"model": ErrorResponse}})
-async def chat(request: ChatRequest, chat_service: ChatSessionService = Depends(get_chat_service),
-               vector_service: VectorStoreService = Depends(get_vector_service)):
+@router.post("", response_model=ChatResponse, responses={500: {"model": ErrorResponse}},
+             openapi_extra=json_body_openapi(ChatRequest))
+async def chat(request: ChatRequest = Depends(json_body(ChatRequest))):
     """
     Send a message in a chat session.
 
     - **message**: User's message
     - **session_id**: Optional session ID (creates new if not provided)
     - **k**: Number of context documents to use (default: 3)
+    - **stream**: Stream the answer as server-sent events, ending with a `done` event carrying the sources
     """
     try:
         start_time = time.time()
@@ -36,31 +30,39 @@ async def chat(request: ChatRequest, chat_service: ChatSessionService = Depends(
         # Create or get a session
         session_id = request.session_id
         if not session_id:
-            session_id = chat_service.create_session()
-        elif not chat_service.get_session(session_id):
+            session_id = await chat_service.create_session()
+
+        # Add a user message to the history; Redis rejects it if the session doesn't exist
+        if not await chat_service.add_message(session_id, "user", request.message):
             raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
 
-        # Add a user message to the history
-        chat_service.add_message(session_id, "user", request.message)
+        if request.stream:
+            # Retrieval and the first LLM chunk block, so they run off the event loop
+            tokens, sources = await run_in_threadpool(
+                vector_service.stream_query_with_sources, request.message, k=request.k
+            )
 
-        # Get answer from vector store
-        answer = vector_service.query(request.message, k=request.k)
+            async def save_answer(answer: str):
+                await chat_service.add_message(session_id, "assistant", answer)
 
-        # Add assistant response to history
-        chat_service.add_message(session_id, "assistant", answer)
+            final = {"session_id": session_id, "message": request.message, "sources": sources}
+            return EventSourceResponse(answer_events(tokens, final, on_complete=save_answer))
+
+        # Get answer and source documents from vector store
+        answer, sources = vector_service.query_with_sources(request.message, k=request.k)
 
-        # Get source documents
-        sources = vector_service.search(request.message, k=request.k)
+        # Add assistant response to history
+        await chat_service.add_message(session_id, "assistant", answer)
 
         processing_time = time.time() - start_time
 
-        return ChatResponse(
-            session_id=session_id,
-            message=request.message,
-            answer=answer,
-            sources=sources,
-            processing_time=processing_time
-        )
+        return ORJSONResponse(content={
+            "session_id": session_id,
+            "message": request.message,
+            "answer": answer,
+            "sources": sources,
+            "processing_time": processing_time,
+        })
 
     except HTTPException:
         raise
@@ -68,24 +70,25 @@ async def chat(request: ChatRequest, chat_service: ChatSessionService = Depends(
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
-@router.get("/sessions", response_model=List[ChatSession])
-async def list_sessions(chat_service: ChatSessionService = Depends(get_chat_service)):
+@router.get("/sessions", response_model=None, responses={200: {"model": List[ChatSession]}})
+async def list_sessions():
     """
     List all chat sessions
     """
-    return chat_service.list_sessions()
+    # Server-built and potentially large, so skip response model validation
+    return ORJSONResponse(content=await chat_service.list_sessions())
 
 
 @router.post("/sessions", response_model=ChatSession)
-async def create_session(chat_service: ChatSessionService = Depends(get_chat_service)):
+async def create_session():
     """
     Create a new chat session
     """
 
-    session_id = chat_service.create_session()
-    session = chat_service.get_session(session_id)
+    session_id = await chat_service.create_session()
+    session = await chat_service.get_session(session_id)
 
-    return ChatSession(
+    return ChatSession.model_construct(
         session_id=session["session_id"],
         created_at=session["created_at"],
         updated_at=session["updated_at"],
@@ -94,15 +97,15 @@ async def create_session(chat_service: ChatSessionService = Depends(get_chat_ser
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSession)
-async def get_session(session_id: str, chat_service: ChatSessionService = Depends(get_chat_service)):
+async def get_session(session_id: str):
     """
     Get a specific chat session
     """
-    session = chat_service.get_session(session_id)
+    session = await chat_service.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
 
-    return ChatSession(
+    return ChatSession.model_construct(
         session_id=session["session_id"],
         created_at=session["created_at"],
         updated_at=session["updated_at"],
@@ -111,11 +114,11 @@ async def get_session(session_id: str, chat_service: ChatSessionService = Depend
 
 
 @router.delete("/sessions/{session_id}")
-async def delete_session(session_id: str, chat_service: ChatSessionService = Depends(get_chat_service)):
+async def delete_session(session_id: str):
     """
     Delete a chat session
     """
-    success = chat_service.delete_session(session_id)
+    success = await chat_service.delete_session(session_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
 
@@ -123,12 +126,20 @@ async def delete_session(session_id: str, chat_service: ChatSessionService = Dep
 
 
 @router.get("/sessions/{session_id}/history", response_model=ChatHistory)
-async def get_session_history(session_id: str, chat_service: ChatSessionService = Depends(get_chat_service)):
+async def get_session_history(session_id: str,
+                              limit: Optional[int] = Query(None, description="Only return the last N messages", ge=1)):
     """
     Get conversation history for a session
+
+    - **limit**: Optional number of most recent messages to return
     """
-    history = chat_service.get_history(session_id)
+    history = await chat_service.get_history(session_id, limit=limit)
     if not history:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
 
-    return ChatHistory(**history)
+    return ChatHistory.model_construct(
+        session_id=history["session_id"],
+        messages=[ChatMessage.model_construct(**m) for m in history["messages"]],
+        created_at=history["created_at"],
+        updated_at=history["updated_at"]
+    )
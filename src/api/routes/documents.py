@@ -1,30 +1,41 @@
+import asyncio
 from typing import List
 
+import aiofiles
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.responses import ORJSONResponse
 
+from src.api.dependencies import document_service, vector_service, json_body, json_body_openapi
 from src.api.models import (DocumentMetadata, DocumentList, DocumentDeleteResponse, RebuildRequest, RebuildResponse,
-                            ErrorResponse)
-from src.api.services import DocumentService, VectorStoreService
-from src.pdf_handler import load_pdfs
-from src.text_splitter import split_text
+                            ErrorResponse, DOC_LIST_ADAPTER)
 
 router = APIRouter(prefix="/api/documents", tags=["Documents"])
 
+# Bytes read from an upload per iteration while streaming it to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
 
-# Dependencies
-def get_document_service():
-    from src.api.dependencies import document_service
-    return document_service
 
+async def _save_upload(file: UploadFile) -> dict:
+    """
+    Stream an uploaded file to disk in chunks and register it as a document
+    """
+    upload_path = document_service.new_upload_path()
+    file_size = 0
 
-def get_vector_service():
-    from src.api.dependencies import vector_service
-    return vector_service
+    try:
+        async with aiofiles.open(upload_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await out.write(chunk)
+                file_size += len(chunk)
+
+        return await document_service.register_document(file.filename, upload_path, file_size)
+    except Exception:
+        upload_path.unlink(missing_ok=True)
+        raise
 
 
 @router.post("/upload", response_model=DocumentMetadata, responses={500: {"model": ErrorResponse}})
-async def upload_document(file: UploadFile = File(...),
-                          document_service: DocumentService = Depends(get_document_service)):
+async def upload_document(file: UploadFile = File(...)):
     """
     Upload a PDF document.
 
@@ -35,40 +46,39 @@ async def upload_document(file: UploadFile = File(...),
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
     try:
-        # Read file content
-        content = await file.read()
-
         # Upload document
-        metadata = document_service.upload_document(file.filename, content)
+        metadata = await _save_upload(file)
 
-        return DocumentMetadata(**metadata)
+        return DocumentMetadata.model_construct(**metadata)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
 @router.post("/bulk-upload", response_model=List[DocumentMetadata])
-async def bulk_upload_documents(files: List[UploadFile] = File(...),
-                                document_service: DocumentService = Depends(get_document_service)):
+async def bulk_upload_documents(files: List[UploadFile] = File(...)):
     """
     Upload multiple PDF documents.
 
     - **files**: List of PDF files to upload
     """
+    async def process_one(file: UploadFile) -> dict:
+        if not file.filename.lower().endswith('.pdf'):
+            raise ValueError("Not a PDF file")
+
+        return await _save_upload(file)
+
+    # Upload all files concurrently
+    results = await asyncio.gather(*[process_one(file) for file in files], return_exceptions=True)
+
     uploaded_docs = []
     errors = []
 
-    for file in files:
-        if not file.filename.lower().endswith('.pdf'):
-            errors.append(f"{file.filename}: Not a PDF file")
-            continue
-
-        try:
-            content = await file.read()
-            metadata = document_service.upload_document(file.filename, content)
-            uploaded_docs.append(DocumentMetadata(**metadata))
-        except Exception as e:
-            errors.append(f"{file.filename}: {str(e)}")
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{file.filename}: {str(result)}")
+        else:
+            uploaded_docs.append(DocumentMetadata.model_construct(**result))
 
     if errors and not uploaded_docs:
         raise HTTPException(status_code=500, detail=f"All uploads failed: {', '.join(errors)}")
@@ -77,20 +87,20 @@ async def bulk_upload_documents(files: List[UploadFile] = File(...),
 
 
 @router.get("", response_model=DocumentList)
-async def list_documents(document_service: DocumentService = Depends(get_document_service)):
+async def list_documents():
     """
     List all uploaded documents
     """
     documents = document_service.list_documents()
 
-    return DocumentList(
-        documents=[DocumentMetadata(**doc) for doc in documents],
-        total=len(documents)
-    )
+    return ORJSONResponse(content={
+        "documents": DOC_LIST_ADAPTER.dump_python(DOC_LIST_ADAPTER.validate_python(documents)),
+        "total": len(documents),
+    })
 
 
 @router.get("/{document_id}", response_model=DocumentMetadata)
-async def get_document(document_id: str, document_service: DocumentService = Depends(get_document_service)):
+async def get_document(document_id: str):
     """
     Get document metadata by ID
     """
@@ -98,11 +108,11 @@ async def get_document(document_id: str, document_service: DocumentService = Dep
     if not document:
         raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
 
-    return DocumentMetadata(**document)
+    return DocumentMetadata.model_construct(**document)
 
 
 @router.delete("/{document_id}", response_model=DocumentDeleteResponse)
-async def delete_document(document_id: str, document_service: DocumentService = Depends(get_document_service)):
+async def delete_document(document_id: str):
     """
     Delete a document
     """
@@ -110,17 +120,16 @@ async def delete_document(document_id: str, document_service: DocumentService =
     if not success:
         raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
 
-    return DocumentDeleteResponse(
+    return DocumentDeleteResponse.model_construct(
         success=True,
         message=f"Document {document_id} deleted successfully",
         document_id=document_id
     )
 
 
-@router.post("/process", response_model=RebuildResponse)
-async def process_documents(request: RebuildRequest = RebuildRequest(),
-                            document_service: DocumentService = Depends(get_document_service),
-                            vector_service: VectorStoreService = Depends(get_vector_service)):
+@router.post("/process", response_model=RebuildResponse,
+             openapi_extra=json_body_openapi(RebuildRequest, optional=True))
+async def process_documents(request: RebuildRequest = Depends(json_body(RebuildRequest, optional=True))):
     """
     Process all documents and rebuild the vector database.
 
@@ -128,25 +137,22 @@ async def process_documents(request: RebuildRequest = RebuildRequest(),
     """
     try:
         # Process documents
-        doc_count, chunk_count = document_service.process_documents()
+        doc_count, chunk_count, chunks = document_service.process_documents()
 
         if chunk_count == 0:
             raise HTTPException(status_code=400, detail="No documents to process")
 
         # Rebuild vector store
-        from src.config import settings
-        text = load_pdfs(settings.PDF_FOLDER)
-        chunks = split_text(text)
         success = vector_service.rebuild(chunks)
 
         if not success:
             raise HTTPException(status_code=500, detail="Failed to rebuild vector store")
 
-        return RebuildResponse(
+        return RebuildResponse.model_construct(
             success=True,
             message="Documents processed and vector store rebuilt successfully",
             documents_processed=doc_count,
-            chunks_created=len(chunks)
+            chunks_created=chunk_count
         )
 
     except HTTPException:
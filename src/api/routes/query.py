@@ -1,44 +1,48 @@
 import time
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
+from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
 
+from src.api.dependencies import vector_service, json_body, json_body_openapi
 from src.api.models import QueryRequest, QueryResponse, ErrorResponse
-from src.api.services import VectorStoreService
+from src.api.streaming import answer_events
 
 router = APIRouter(prefix="/api", tags=["Query"])
 
 
-# Dependency
-def get_vector_service():
-    from src.api.dependencies import vector_service
-    return vector_service
-
-
-@router.post("/query", response_model=QueryResponse, responses={500: {"model": ErrorResponse}})
-async def query_documents(request: QueryRequest, vector_service: VectorStoreService = Depends(get_vector_service)):
+@router.post("/query", response_model=QueryResponse, responses={500: {"model": ErrorResponse}},
+             openapi_extra=json_body_openapi(QueryRequest))
+async def query_documents(request: QueryRequest = Depends(json_body(QueryRequest))):
     """
     Query the document knowledge base with a question.
 
     - **query**: The question to ask
     - **k**: Number of similar document chunks to use for context (default: 3)
+    - **stream**: Stream the answer as server-sent events, ending with a `done` event carrying the sources
     """
     try:
         start_time = time.time()
 
-        # Get answer from vector store
-        answer = vector_service.query(request.query, k=request.k)
+        if request.stream:
+            # Retrieval and the first LLM chunk block, so they run off the event loop
+            tokens, sources = await run_in_threadpool(
+                vector_service.stream_query_with_sources, request.query, k=request.k
+            )
+            return EventSourceResponse(answer_events(tokens, {"query": request.query, "sources": sources}))
 
-        # Get source documents
-        sources = vector_service.search(request.query, k=request.k)
+        # Get answer and source documents from vector store
+        answer, sources = vector_service.query_with_sources(request.query, k=request.k)
 
         processing_time = time.time() - start_time
 
-        return QueryResponse(
-            query=request.query,
-            answer=answer,
-            sources=sources,
-            processing_time=processing_time
-        )
+        return ORJSONResponse(content={
+            "query": request.query,
+            "answer": answer,
+            "sources": sources,
+            "processing_time": processing_time,
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
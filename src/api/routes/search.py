@@ -1,19 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 
-from src.api.models import SearchRequest, SearchResponse, SearchResult, ErrorResponse
-from src.api.services import VectorStoreService
+from src.api.dependencies import vector_service, json_body, json_body_openapi
+from src.api.models import SearchRequest, SearchResponse, ErrorResponse, SEARCH_LIST_ADAPTER
 
 router = APIRouter(prefix="/api/search", tags=["Search"])
 
 
-# Dependency
-def get_vector_service():
-    from src.api.dependencies import vector_service
-    return vector_service
-
-
-@router.post("", response_model=SearchResponse, responses={500: {"model": ErrorResponse}})
-async def search_documents(request: SearchRequest, vector_service: VectorStoreService = Depends(get_vector_service)):
+@router.post("", response_model=SearchResponse, responses={500: {"model": ErrorResponse}},
+             openapi_extra=json_body_openapi(SearchRequest))
+async def search_documents(request: SearchRequest = Depends(json_body(SearchRequest))):
     """
     Semantic search through documents without generating an answer.
 
@@ -23,18 +19,18 @@ async def search_documents(request: SearchRequest, vector_service: VectorStoreSe
     try:
         results = vector_service.search(request.query, k=request.k)
 
-        return SearchResponse(
-            query=request.query,
-            results=[SearchResult(**r) for r in results],
-            total=len(results)
-        )
+        return ORJSONResponse(content={
+            "query": request.query,
+            "results": SEARCH_LIST_ADAPTER.dump_python(SEARCH_LIST_ADAPTER.validate_python(results)),
+            "total": len(results),
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
-@router.post("/similar", response_model=SearchResponse)
-async def find_similar(request: SearchRequest, vector_service: VectorStoreService = Depends(get_vector_service)):
+@router.post("/similar", response_model=SearchResponse, openapi_extra=json_body_openapi(SearchRequest))
+async def find_similar(request: SearchRequest = Depends(json_body(SearchRequest))):
     """
     Find similar content to the given query.
 
@@ -44,11 +40,11 @@ async def find_similar(request: SearchRequest, vector_service: VectorStoreServic
     try:
         results = vector_service.search(request.query, k=request.k)
 
-        return SearchResponse(
-            query=request.query,
-            results=[SearchResult(**r) for r in results],
-            total=len(results)
-        )
+        return ORJSONResponse(content={
+            "query": request.query,
+            "results": SEARCH_LIST_ADAPTER.dump_python(SEARCH_LIST_ADAPTER.validate_python(results)),
+            "total": len(results),
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Similarity search failed: {str(e)}")
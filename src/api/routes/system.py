@@ -1,52 +1,64 @@
+import hashlib
+import time
 from datetime import datetime
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Request, Response
 
+from src.api.dependencies import document_service, vector_service
 from src.api.models import HealthResponse, StatsResponse
-from src.api.services import DocumentService, VectorStoreService
 
 router = APIRouter(prefix="/api", tags=["System"])
 
+# Let probes and proxies reuse system responses for a few seconds
+CACHE_HEADERS = {"Cache-Control": "max-age=5"}
 
-# Dependencies
-def get_document_service():
-    from src.api.dependencies import document_service
-    return document_service
+# Encoded health payload reused for up to a second, so frequent probes don't rebuild it
+_health_cache: Optional[Tuple[float, bytes]] = None
 
 
-def get_vector_service():
-    from src.api.dependencies import vector_service
-    return vector_service
-
-
-@router.get("/health", response_model=HealthResponse)
+@router.api_route("/health", methods=["GET", "HEAD"], response_model=HealthResponse)
 async def health_check():
     """
     Health check endpoint.
 
     Returns the system status and version information.
     """
-    return HealthResponse(
-        status="healthy",
-        version="1.0.0",
-        timestamp=datetime.utcnow()
-    )
+    global _health_cache
+
+    now = time.monotonic()
+    if _health_cache is None or now - _health_cache[0] >= 1:
+        _health_cache = (now, orjson.dumps({
+            "status": "healthy",
+            "version": "1.0.0",
+            "timestamp": datetime.utcnow(),
+        }))
+
+    return Response(_health_cache[1], media_type="application/json", headers=CACHE_HEADERS)
 
 
 @router.get("/stats", response_model=StatsResponse)
-async def get_stats(document_service: DocumentService = Depends(get_document_service),
-                    vector_service: VectorStoreService = Depends(get_vector_service)):
+async def get_stats(request: Request):
     """
     Get system statistics.
 
     Returns information about documents, vector store, and system state.
+    Supports conditional requests through `ETag` / `If-None-Match`.
     """
     documents = document_service.list_documents()
     vector_stats = vector_service.get_stats()
 
-    return StatsResponse(
-        total_documents=len(documents),
-        total_chunks=vector_stats.get("total_chunks", 0),
-        vector_db_size=vector_stats.get("db_size"),
-        last_updated=vector_stats.get("last_updated")
-    )
+    body = orjson.dumps({
+        "total_documents": len(documents),
+        "total_chunks": vector_stats.get("total_chunks", 0),
+        "vector_db_size": vector_stats.get("db_size"),
+        "last_updated": vector_stats.get("last_updated"),
+    })
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    headers = {**CACHE_HEADERS, "ETag": etag}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,15 +1,109 @@
-import uuid
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import fitz
+import orjson
+from redis.asyncio import Redis
 
 from src.config import settings
-from src.pdf_handler import load_pdfs
-from src.rag_pipeline import answer_query
-from src.text_splitter import split_text
-from src.vector_store import create_vectorstore
+from src.pdf_handler import iter_pdf_texts
+from src.rag_pipeline import answer_query, embed_query, retrieve_with_scores
+from src.text_splitter import split_stream
+from src.vector_store import create_vectorstore, get_embedder
+
+# Redis set holding the IDs of all chat sessions
+SESSIONS_KEY = "sessions"
+# Number of decoded sessions kept in process for hot reads
+SESSION_CACHE_SIZE = 256
+# Seconds a cached session is trusted before it is re-read, bounding how stale
+# deletes and message counts from other workers can appear
+SESSION_CACHE_TTL = 2
+
+# Appends a message only if the session hash still exists, so a session deleted by
+# another worker is never recreated as a partial hash; returns the new message count or nil
+ADD_MESSAGE_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], "session_id") == 0 then
+    return false
+end
+redis.call("RPUSH", KEYS[2], ARGV[1])
+local count = redis.call("HINCRBY", KEYS[1], "message_count", 1)
+redis.call("HSET", KEYS[1], "updated_at", ARGV[2])
+return count
+"""
+
+# Number of (answer, sources) results kept per vector store
+QA_CACHE_SIZE = 512
+
+# Seconds to reuse the result of a vector store directory scan
+STATS_CACHE_TTL = 30
+
+
+# Worker processes for PDF parsing, created on first use
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        # Workers start from a clean process instead of forking the running server,
+        # with its torch threads, gRPC channel and Chroma client
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pdf_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context(method))
+    return _pdf_executor
+
+
+def _discard_pdf_executor(executor: ProcessPoolExecutor):
+    """
+    Drop a broken pool, so the next call to _get_pdf_executor starts a fresh one
+    """
+    global _pdf_executor
+    if _pdf_executor is executor:
+        _pdf_executor = None
+    executor.shutdown(wait=False)
+
+
+def _count_pages(file_path: Path) -> Optional[int]:
+    """
+    Count the pages of a PDF, or None if it cannot be opened
+    """
+    try:
+        with fitz.open(file_path) as doc:
+            return len(doc)
+    except Exception:
+        return None
+
+
+def _scan_directory(path: str) -> Tuple[int, Optional[float]]:
+    """
+    Return the total size and latest modification time of all files under a directory
+    """
+    total_size = 0
+    last_mtime = None
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                size, mtime = _scan_directory(entry.path)
+            elif entry.is_file():
+                st = entry.stat()
+                size, mtime = st.st_size, st.st_mtime
+            else:
+                continue
+
+            total_size += size
+            if mtime is not None and (last_mtime is None or mtime > last_mtime):
+                last_mtime = mtime
+
+    return total_size, last_mtime
 
 
 class DocumentService:
@@ -30,40 +124,59 @@ class DocumentService:
         if not self.data_folder.exists():
             return
 
-        for pdf_file in self.data_folder.glob("*.pdf"):
-            doc_id = pdf_file.stem
-            self._documents_metadata[doc_id] = {
-                "id": doc_id,
-                "filename": pdf_file.name,
-                "file_size": pdf_file.stat().st_size,
-                "uploaded_at": datetime.fromtimestamp(pdf_file.stat().st_ctime),
-                "processed": True,
-            }
+        # DirEntry caches its stat result, so each file costs a single syscall
+        with os.scandir(self.data_folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".pdf") or not entry.is_file():
+                    continue
 
-    def upload_document(self, filename: str, content: bytes) -> dict:
+                doc_id = entry.name[:-4]
+                st = entry.stat()
+                self._documents_metadata[doc_id] = {
+                    "id": doc_id,
+                    "filename": entry.name,
+                    "file_size": st.st_size,
+                    "uploaded_at": datetime.fromtimestamp(st.st_ctime),
+                    "processed": True,
+                }
+
+    def new_upload_path(self) -> Path:
         """
-        Upload a new PDF document
+        Reserve a path for an incoming upload; its stem becomes the document ID
         """
         # Generate unique ID
-        doc_id = str(uuid.uuid4())
+        doc_id = os.urandom(16).hex()
+
+        # The .part suffix keeps incomplete uploads out of the *.pdf listing
+        return self.data_folder / f"{doc_id}.part"
 
-        # Save file
+    async def register_document(self, filename: str, upload_path: Path, file_size: int) -> dict:
+        """
+        Register a PDF that has been written to a path from new_upload_path
+        """
+        doc_id = upload_path.stem
         file_path = self.data_folder / f"{doc_id}.pdf"
-        with open(file_path, "wb") as f:
-            f.write(content)
+        os.replace(upload_path, file_path)
 
-        # Extract metadata
+        # Extract metadata in a worker process, since fitz parsing is blocking and CPU-bound
+        executor = _get_pdf_executor()
         try:
-            with fitz.open(file_path) as doc:
-                page_count = len(doc)
-        except Exception:
+            page_count = await asyncio.get_running_loop().run_in_executor(executor, _count_pages, file_path)
+        except BrokenProcessPool:
+            # A worker died (e.g. MuPDF crashed on a malformed file); like any unreadable PDF,
+            # the document is kept without a page count and later uploads get a new pool
+            _discard_pdf_executor(executor)
             page_count = None
+        except BaseException:
+            # Don't leave an unregistered PDF behind to be listed as processed on the next start
+            file_path.unlink(missing_ok=True)
+            raise
 
         # Store metadata
         metadata = {
             "id": doc_id,
             "filename": filename,
-            "file_size": len(content),
+            "file_size": file_size,
             "page_count": page_count,
             "uploaded_at": datetime.utcnow(),
             "processed": False,
@@ -100,104 +213,202 @@ class DocumentService:
         del self._documents_metadata[doc_id]
         return True
 
-    def process_documents(self) -> tuple:
+    def process_documents(self) -> Tuple[int, int, List[str]]:
         """
-        Process all documents and create a vector store
+        Process all documents into text chunks for the vector store
         """
-        text = load_pdfs(str(self.data_folder))
-        chunks = split_text(text)
+        # Files are split as their text arrives, so the corpus is never tokenized in one call
+        chunks = list(split_stream(iter_pdf_texts(str(self.data_folder))))
 
         # Mark all as processed
         for doc_id in self._documents_metadata:
             self._documents_metadata[doc_id]["processed"] = True
 
-        return len(self._documents_metadata), len(chunks)
+        return len(self._documents_metadata), len(chunks), chunks
 
 
 class ChatSessionService:
     """
-    Service for managing chat sessions
+    Service for managing chat sessions.
+
+    Session metadata is stored in Redis as a hash at ``session:{id}`` and messages
+    as a list at ``session:{id}:msgs``, so all workers share the same sessions.
     """
 
-    def __init__(self):
-        self._sessions: Dict[str, dict] = {}
+    def __init__(self, redis: Redis):
+        self._redis = redis
+        self._add_message = redis.register_script(ADD_MESSAGE_SCRIPT)
+        # Recently used sessions, decoded, with the monotonic time they were read;
+        # may lag behind writes made by other workers for up to SESSION_CACHE_TTL
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _messages_key(session_id: str) -> str:
+        return f"session:{session_id}:msgs"
+
+    @staticmethod
+    def _decode_session(raw: dict) -> Optional[dict]:
+        # A hash without session_id is not a complete session and is treated as missing
+        if "session_id" not in raw:
+            return None
+
+        return {
+            "session_id": raw["session_id"],
+            "created_at": datetime.fromisoformat(raw["created_at"]),
+            "updated_at": datetime.fromisoformat(raw["updated_at"]),
+            "message_count": int(raw["message_count"]),
+        }
+
+    def _cache_put(self, session: dict):
+        self._cache[session["session_id"]] = (time.monotonic(), session)
+        self._cache.move_to_end(session["session_id"])
+        if len(self._cache) > SESSION_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _cache_get(self, session_id: str) -> Optional[dict]:
+        entry = self._cache.get(session_id)
+        if entry is None:
+            return None
+
+        cached_at, session = entry
+        if time.monotonic() - cached_at >= SESSION_CACHE_TTL:
+            del self._cache[session_id]
+            return None
+
+        self._cache.move_to_end(session_id)
+        return session
 
-    def create_session(self) -> str:
+    async def create_session(self) -> str:
         """
         Create a new chat session
         """
-        session_id = str(uuid.uuid4())
-        self._sessions[session_id] = {
+        session_id = os.urandom(16).hex()
+        now = datetime.utcnow()
+        session = {
             "session_id": session_id,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-            "messages": [],
+            "created_at": now,
+            "updated_at": now,
             "message_count": 0,
         }
+
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._session_key(session_id), mapping={
+                "session_id": session_id,
+                "created_at": now.isoformat(),
+                "updated_at": now.isoformat(),
+                "message_count": 0,
+            })
+            pipe.sadd(SESSIONS_KEY, session_id)
+            await pipe.execute()
+
+        self._cache_put(session)
         return session_id
 
-    def get_session(self, session_id: str) -> Optional[dict]:
+    async def get_session(self, session_id: str) -> Optional[dict]:
         """
         Get session by ID
         """
-        return self._sessions.get(session_id)
+        session = self._cache_get(session_id)
+        if session is not None:
+            return session
+
+        session = self._decode_session(await self._redis.hgetall(self._session_key(session_id)))
+        if session is None:
+            return None
 
-    def list_sessions(self) -> List[dict]:
+        self._cache_put(session)
+        return session
+
+    async def list_sessions(self) -> List[dict]:
         """
         List all sessions
         """
-        return [
-            {
-                "session_id": s["session_id"],
-                "created_at": s["created_at"],
-                "updated_at": s["updated_at"],
-                "message_count": s["message_count"],
-            }
-            for s in self._sessions.values()
-        ]
+        session_ids = await self._redis.smembers(SESSIONS_KEY)
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.hgetall(self._session_key(session_id))
+            raw_sessions = await pipe.execute()
+
+        sessions = (self._decode_session(raw) for raw in raw_sessions)
+        return [session for session in sessions if session is not None]
 
-    def add_message(self, session_id: str, role: str, content: str):
+    async def add_message(self, session_id: str, role: str, content: str):
         """
         Add a message to a session
         """
-        if session_id not in self._sessions:
-            return False
-
+        now = datetime.utcnow()
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
         }
 
-        self._sessions[session_id]["messages"].append(message)
-        self._sessions[session_id]["message_count"] += 1
-        self._sessions[session_id]["updated_at"] = datetime.utcnow()
+        # Existence is checked in Redis, atomically with the write, since the local cache
+        # can't see deletes made by other workers; only the new message and counters are written
+        message_count = await self._add_message(
+            keys=[self._session_key(session_id), self._messages_key(session_id)],
+            args=[orjson.dumps(message), now.isoformat()],
+        )
+        if message_count is None:
+            self._cache.pop(session_id, None)
+            return False
+
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            entry[1]["message_count"] = message_count
+            entry[1]["updated_at"] = now
 
         return True
 
-    def get_history(self, session_id: str) -> Optional[dict]:
+    async def get_history(self, session_id: str, limit: Optional[int] = None) -> Optional[dict]:
         """
-        Get chat history for the session
+        Get chat history for the session, optionally only the last `limit` messages
         """
-        session = self._sessions.get(session_id)
-        if not session:
+        # Read the session together with the tail instead of trusting the cache, so a session
+        # deleted or extended by another worker is reported as it is now
+        start = -limit if limit else 0
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._session_key(session_id))
+            pipe.lrange(self._messages_key(session_id), start, -1)
+            raw_session, raw_messages = await pipe.execute()
+
+        session = self._decode_session(raw_session)
+        if session is None:
+            self._cache.pop(session_id, None)
             return None
 
+        self._cache_put(session)
+
+        messages = []
+        for raw in raw_messages:
+            message = orjson.loads(raw)
+            message["timestamp"] = datetime.fromisoformat(message["timestamp"])
+            messages.append(message)
+
         return {
             "session_id": session_id,
-            "messages": session["messages"],
+            "messages": messages,
             "created_at": session["created_at"],
             "updated_at": session["updated_at"],
         }
 
-    def delete_session(self, session_id: str) -> bool:
+    async def delete_session(self, session_id: str) -> bool:
         """
         Delete a session
         """
-        if session_id in self._sessions:
-            del self._sessions[session_id]
-            return True
-        return False
+        self._cache.pop(session_id, None)
+
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._session_key(session_id), self._messages_key(session_id))
+            pipe.srem(SESSIONS_KEY, session_id)
+            deleted, _ = await pipe.execute()
+
+        return deleted > 0
 
 
 class VectorStoreService:
@@ -207,6 +418,11 @@ class VectorStoreService:
 
     def __init__(self):
         self.vectordb = None
+        self._stats_cache: Optional[Tuple[float, dict]] = None
+        # Answered queries keyed by (query, k); only valid for the current vector store
+        self._qa_cache: "OrderedDict[Tuple[str, int], Tuple[str, List[dict]]]" = OrderedDict()
+        # Answers are looked up on the event loop and stored from streaming worker threads
+        self._qa_lock = threading.Lock()
         self._initialize()
 
     def _initialize(self):
@@ -219,11 +435,8 @@ class VectorStoreService:
             # Load the existing vector store
             try:
                 from langchain_chroma import Chroma
-                from langchain_huggingface import HuggingFaceEmbeddings
 
-                embedding_model = HuggingFaceEmbeddings(
-                    model_name="sentence-transformers/all-MiniLM-L6-v2"
-                )
+                embedding_model = get_embedder()
 
                 self.vectordb = Chroma(
                     embedding_function=embedding_model,
@@ -241,31 +454,111 @@ class VectorStoreService:
             return True
         except Exception:
             return False
+        finally:
+            self._stats_cache = None
+            self._qa_cache = OrderedDict()
 
-    def query(self, query_text: str, k: int = 3) -> str:
+    def query_with_sources(self, query_text: str, k: int = 3) -> Tuple[str, List[dict]]:
         """
-        Query the vector store
+        Query the vector store and return the answer along with its sources,
+        using a single similarity search for both
         """
         if not self.vectordb:
             raise ValueError("Vector store not initialized")
 
-        return answer_query(self.vectordb, query_text)
+        # Bound now, so an answer finished after a rebuild lands in the discarded cache
+        cache = self._qa_cache
+        key = (query_text, k)
+        cached = self._cached_answer(cache, key)
+        if cached is not None:
+            return cached
 
-    def search(self, query_text: str, k: int = 5) -> List[dict]:
+        docs, sources = self._retrieve(query_text, k)
+        answer = answer_query(self.vectordb, query_text, prefetched_docs=docs)
+        self._cache_answer(cache, key, answer, sources)
+
+        return answer, sources
+
+    def stream_query_with_sources(self, query_text: str, k: int = 3) -> Tuple[Iterator[str], List[dict]]:
         """
-        Semantic search without LLM
+        Like query_with_sources, but the answer is returned as an iterator of text
+        chunks as the LLM produces them.
+
+        Retrieval and the request for the first chunk block, so call this from a worker thread.
         """
         if not self.vectordb:
             raise ValueError("Vector store not initialized")
 
-        docs = self.vectordb.similarity_search(query_text, k=k)
+        # Bound now, so an answer finished streaming after a rebuild lands in the discarded cache
+        cache = self._qa_cache
+        key = (query_text, k)
+        cached = self._cached_answer(cache, key)
+        if cached is not None:
+            answer, sources = cached
+            return iter([answer]), sources
 
-        return [
+        docs, sources = self._retrieve(query_text, k)
+        tokens = answer_query(self.vectordb, query_text, prefetched_docs=docs, stream=True)
+
+        def stream() -> Iterator[str]:
+            parts = []
+            for token in tokens:
+                parts.append(token)
+                yield token
+            # Only fully streamed answers are cached
+            self._cache_answer(cache, key, "".join(parts), sources)
+
+        return stream(), sources
+
+    def _retrieve(self, query_text: str, k: int) -> Tuple[list, List[dict]]:
+        """
+        Run one similarity search, returning the documents and their source dicts
+        """
+        results = retrieve_with_scores(self.vectordb, query_text, k)
+
+        docs = [doc for doc, _ in results]
+        sources = [
             {
                 "content": doc.page_content,
-                "metadata": doc.metadata if hasattr(doc, 'metadata') else {},
+                "metadata": doc.metadata,
+                "score": score,
             }
-            for doc in docs
+            for doc, score in results
+        ]
+
+        return docs, sources
+
+    def _cached_answer(self, cache: OrderedDict, key: Tuple[str, int]) -> Optional[Tuple[str, List[dict]]]:
+        with self._qa_lock:
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+            return cached
+
+    def _cache_answer(self, cache: OrderedDict, key: Tuple[str, int], answer: str, sources: List[dict]):
+        with self._qa_lock:
+            cache[key] = (answer, sources)
+            if len(cache) > QA_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    def search(self, query_text: str, k: int = 5) -> List[dict]:
+        """
+        Semantic search without LLM
+        """
+        if not self.vectordb:
+            raise ValueError("Vector store not initialized")
+
+        vector = embed_query(self.vectordb, query_text)
+        # Query the collection directly to skip building Document objects and fetch only needed fields
+        result = self.vectordb._collection.query(
+            query_embeddings=[vector],
+            n_results=k,
+            include=["documents", "metadatas"],
+        )
+
+        return [
+            {"content": content, "metadata": metadata or {}}
+            for content, metadata in zip(result["documents"][0], result["metadatas"][0])
         ]
 
     def get_stats(self) -> dict:
@@ -274,6 +567,11 @@ class VectorStoreService:
         """
         db_path = Path(settings.CHROMA_DB)
 
+        if self._stats_cache is not None:
+            cached_at, cached_stats = self._stats_cache
+            if time.monotonic() - cached_at < STATS_CACHE_TTL:
+                return cached_stats
+
         stats = {
             "total_chunks": 0,
             "db_size": "0 MB",
@@ -281,16 +579,12 @@ class VectorStoreService:
         }
 
         if db_path.exists():
-            # Calculate directory size
-            total_size = sum(f.stat().st_size for f in db_path.rglob('*') if f.is_file())
+            # Calculate directory size and last modified time in one pass
+            total_size, last_mtime = _scan_directory(str(db_path))
             stats["db_size"] = f"{total_size / (1024 * 1024):.2f} MB"
 
-            # Get last modified time
-            try:
-                stats["last_updated"] = datetime.fromtimestamp(
-                    max(f.stat().st_mtime for f in db_path.rglob('*') if f.is_file())
-                )
-            except Exception:
-                pass
+            if last_mtime is not None:
+                stats["last_updated"] = datetime.fromtimestamp(last_mtime)
 
+        self._stats_cache = (time.monotonic(), stats)
         return stats
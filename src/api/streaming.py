@@ -0,0 +1,30 @@
+"""
+Server-sent event helpers for streamed answers.
+"""
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+import orjson
+from starlette.concurrency import iterate_in_threadpool
+
+
+async def answer_events(tokens: Iterator[str], final: dict,
+                        on_complete: Optional[Callable[[str], Awaitable[None]]] = None) -> AsyncIterator[dict]:
+    """
+    Emit each answer chunk as a "token" event, then a terminal "done" event carrying `final`.
+
+    The token iterator blocks on the LLM, so it is consumed in a worker thread.
+    `on_complete` receives the full answer once streaming has finished.
+    """
+    try:
+        parts = []
+        async for token in iterate_in_threadpool(tokens):
+            parts.append(token)
+            yield {"event": "token", "data": token}
+
+        if on_complete is not None:
+            await on_complete("".join(parts))
+
+        yield {"event": "done", "data": orjson.dumps(final).decode()}
+
+    except Exception as e:
+        yield {"event": "error", "data": orjson.dumps({"error": str(e)}).decode()}
@@ -5,6 +5,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 # Disable ChromaDB telemetry before any imports
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
@@ -31,16 +32,25 @@ async def lifespan(app: FastAPI):
         sys.exit(1)
 
     # Check if vector store exists
-    from api.dependencies import vector_service
+    from src.api.dependencies import vector_service
     if vector_service.vectordb is None:
         print("⚠ Warning: Vector store not initialized. Upload documents and run /api/documents/process")
     else:
         print("✓ Vector store loaded successfully")
 
+        # Run one embedding so the first user query doesn't pay for model warm-up
+        try:
+            vector_service.vectordb.embeddings.embed_query("warmup")
+            print("✓ Embedding model warmed")
+        except Exception as e:
+            print(f"⚠ Warning: Embedding warm-up failed: {e}")
+
     yield
 
     # Shutdown
     print("Shutting down...")
+    from src.api.dependencies import redis_client
+    await redis_client.aclose()
 
 
 # Create FastAPI app
@@ -66,6 +76,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -109,6 +120,8 @@ if __name__ == "__main__":
         "app:app",
         host="0.0.0.0",
         port=port,
-        reload=True,
+        reload=False,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
@@ -7,6 +7,7 @@ load_dotenv()
 
 class Settings:
     GENAI_API_KEY = os.getenv("GENAI_API_KEY")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     # Get the project root directory (parent of src)
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     PDF_FOLDER = os.path.join(BASE_DIR, "data")
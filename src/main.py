@@ -1,8 +1,9 @@
+import asyncio
 import os
 import sys
+import threading
 import warnings
 from contextlib import contextmanager
-from io import StringIO
 
 # Disable ChromaDB telemetry before any imports
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
@@ -11,48 +12,123 @@ os.environ["ANONYMIZED_TELEMETRY"] = "False"
 warnings.filterwarnings("ignore", category=FutureWarning, module="google.api_core")
 
 from config import settings
-from pdf_handler import load_pdfs
-from rag_pipeline import configure_llm, answer_query
-from text_splitter import split_text
-from vector_store import create_vectorstore
+from pdf_handler import iter_pages
+from rag_pipeline import configure_llm, get_llm, stream_answer
+from text_splitter import split_stream
+from vector_store import create_vectorstore, get_embedder
 
 
 @contextmanager
 def suppress_stderr():
     """Temporarily suppress stderr to hide ChromaDB telemetry errors"""
     original_stderr = sys.stderr
-    sys.stderr = StringIO()
+    # os.devnull rather than an in-memory buffer, which would grow for as long as it is installed
+    with open(os.devnull, "w") as devnull:
+        sys.stderr = devnull
+        try:
+            yield
+        finally:
+            sys.stderr = original_stderr
+
+
+async def _read_line(prompt: str) -> str:
+    """Read a line on a daemon thread, so a pending input() never holds up interpreter shutdown"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def read():
+        try:
+            result, error = input(prompt), None
+        except (EOFError, KeyboardInterrupt) as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            # The loop has already closed; nobody is waiting for this line
+            pass
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def _answer_into(queue: asyncio.Queue, vectordb, query: str):
+    """Stream an answer into a queue, ending with None"""
     try:
-        yield
+        async for text in stream_answer(vectordb, query):
+            await queue.put(text)
+    except Exception as e:
+        await queue.put(f"[Error: {e}]")
     finally:
-        sys.stderr = original_stderr
+        await queue.put(None)
+
+
+async def _print_answers(answers: asyncio.Queue):
+    """Print answers in the order they were asked, streaming each one as it arrives"""
+    while (item := await answers.get()) is not None:
+        query, queue = item
+        print(f"\nAI Response ({query}): ", end="", flush=True)
+        while (text := await queue.get()) is not None:
+            print(text, end="", flush=True)
+        print()
+
+
+async def repl(vectordb):
+    answers = asyncio.Queue()
+    printer = asyncio.create_task(_print_answers(answers))
+    pending = []
+
+    while True:
+        try:
+            query = await _read_line("\nAsk a question (or type 'exit'): ")
+        except EOFError:
+            break
+
+        if query.lower() == "exit":
+            break
+
+        # Start answering right away and go back to the prompt; the printer shows it when ready
+        queue = asyncio.Queue()
+        pending.append(asyncio.create_task(_answer_into(queue, vectordb, query)))
+        await answers.put((query, queue))
+
+    # Let outstanding answers finish before exiting
+    await answers.put(None)
+    await printer
 
 
 def main():
     try:
         configure_llm(settings.GENAI_API_KEY)
+        get_llm()
 
-        print("Loading PDFs...")
-        text = load_pdfs(settings.PDF_FOLDER)
+        # Load the embedding model up front rather than lazily during ingest
+        print("Loading embedding model...")
+        with suppress_stderr():
+            get_embedder()
 
-        print("Splitting text...")
-        chunks = split_text(text)
+        # Pages are split as they are read, so the full text is never held in memory
+        print("Loading and splitting PDFs...")
+        chunks = list(split_stream(iter_pages(settings.PDF_FOLDER)))
 
         print("Creating vector database...")
         with suppress_stderr():
             vectordb = create_vectorstore(chunks, settings.CHROMA_DB)
 
         print("System ready!")
-        while True:
-            query = input("\nAsk a question (or type 'exit'): ")
-
-            if query.lower() == "exit":
-                break
-
-            with suppress_stderr():
-                answer = answer_query(vectordb, query)
-            print("\nAI Response:", answer)
+        # Answers run concurrently, so stderr is suppressed once for the whole session
+        with suppress_stderr():
+            asyncio.run(repl(vectordb))
 
+    except KeyboardInterrupt:
+        print()
     except Exception as e:
         print("\nFATAL ERROR:", e)
 
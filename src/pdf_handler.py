@@ -1,24 +1,69 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
 import fitz
 
+# Default plain-text flags without ligature preservation, so ligatures are expanded instead of post-processed
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+
+
+def _extract_text(file_path: str) -> str:
+    try:
+        parts = []
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                parts.append(page.get_text("text", flags=TEXT_FLAGS))
+        parts.append("\n")
+        return "".join(parts)
 
-def load_pdfs(folder_path: str) -> str:
-    text = ""
+    except Exception as e:
+        raise RuntimeError(f"Error reading {os.path.basename(file_path)}: {e}")
 
+
+def _pdf_paths(folder_path: str) -> list:
     if not os.path.exists(folder_path):
         raise FileNotFoundError(f"PDF folder not found: {folder_path}")
 
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(".pdf"):
-            file_path = os.path.join(folder_path, filename)
+    with os.scandir(folder_path) as entries:
+        pdfs = [entry for entry in entries if entry.is_file() and entry.name.lower().endswith(".pdf")]
+
+    # Largest files first, so the process pool isn't left waiting on one big file at the end
+    pdfs.sort(key=lambda entry: entry.stat().st_size, reverse=True)
+    return [entry.path for entry in pdfs]
+
+
+def iter_pages(folder_path: str) -> Iterator[str]:
+    """
+    Yield the text of every page, file by file, with a newline after each file.
+
+    Produces the same text as iter_pdf_texts without ever holding more than one page.
+    """
+    file_paths = _pdf_paths(folder_path)
+
+    for file_path in file_paths:
+        try:
+            with fitz.open(file_path) as doc:
+                for page in doc:
+                    yield page.get_text("text", flags=TEXT_FLAGS)
+        except Exception as e:
+            raise RuntimeError(f"Error reading {os.path.basename(file_path)}: {e}")
+
+        yield "\n"
+
 
-            try:
-                with fitz.open(file_path) as doc:
-                    for page in doc:
-                        text += page.get_text()
-                text += "\n"
+def iter_pdf_texts(folder_path: str) -> Iterator[str]:
+    """
+    Yield the text of each file, ending with a newline, in the same order as iter_pages
+    """
+    file_paths = _pdf_paths(folder_path)
 
-            except Exception as e:
-                raise RuntimeError(f"Error reading {filename}: {e}")
+    # A single file isn't worth the cost of starting worker processes
+    if len(file_paths) <= 1:
+        yield from map(_extract_text, file_paths)
+        return
 
-    return text
+    # PDF parsing is CPU-bound, so extract files in parallel across processes, preserving order
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_extract_text, file_paths)
@@ -1,24 +1,169 @@
+import asyncio
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Tuple
+from weakref import WeakKeyDictionary
+
 import google.generativeai as genai
 
+# Query embeddings keyed by (model_name, normalized query), stored as packed float32 bytes
+EMBEDDING_CACHE_SIZE = 1024
+_embedding_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+# Distinct (query, k) retrievals kept in memory per vector store
+RETRIEVAL_CACHE_SIZE = 1024
+
+# Weakly keyed by store, so a replaced store is freed together with its cached retrievals
+_retrieval_caches: "WeakKeyDictionary[object, OrderedDict]" = WeakKeyDictionary()
+
+# Both query caches are used from the event loop and from worker threads
+_cache_lock = threading.Lock()
+
+# Characters of retrieved text sent to the LLM per query; bounds prompt size as k grows
+CONTEXT_CHAR_BUDGET = 6000
+
 
 def configure_llm(api_key: str):
     try:
+        # The transport is left to the SDK: its defaults already keep a persistent gRPC channel
+        # (grpc for sync calls, grpc_asyncio for async ones), and forcing "grpc" would also make
+        # the async client use the sync transport, breaking generate_content_async
         genai.configure(api_key=api_key)
     except Exception as e:
         raise RuntimeError(f"Failed to configure Google LLM: {e}")
 
 
-def answer_query(db, query: str, model="gemini-2.5-flash"):
+@lru_cache(maxsize=4)
+def get_llm(model="gemini-2.5-flash"):
+    """
+    Return a shared GenerativeModel instead of constructing one per query
+    """
+    return genai.GenerativeModel(model)
+
+
+def _normalize_query(query: str) -> str:
+    # all-MiniLM-L6-v2 is uncased and ignores whitespace runs, so this doesn't change the embedding
+    return " ".join(query.lower().split())
+
+
+def embed_query(db, query: str) -> List[float]:
+    """
+    Embed a query with the store's model, reusing the vector of an earlier query with the same normalized text
+    """
+    text = _normalize_query(query)
+    key = (getattr(db.embeddings, "model_name", type(db.embeddings).__name__), text)
+
+    # Cache access is serialized; the embedding itself runs unlocked
+    with _cache_lock:
+        blob = _embedding_cache.get(key)
+        if blob is not None:
+            _embedding_cache.move_to_end(key)
+            return array("f", blob).tolist()
+
+    vector = db.embeddings.embed_query(text)
+
+    with _cache_lock:
+        _embedding_cache[key] = array("f", vector).tobytes()
+        if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+    return vector
+
+
+def retrieve_with_scores(db, query: str, k=3) -> list:
+    """
+    Similarity search returning (document, score) pairs, cached on the normalized query
+    so repeated questions skip both the embedding pass and the index lookup
+    """
+    key = (_normalize_query(query), k)
+
+    with _cache_lock:
+        cache = _retrieval_caches.setdefault(db, OrderedDict())
+        results = cache.get(key)
+        if results is not None:
+            cache.move_to_end(key)
+            return list(results)
+
+    results = tuple(db.similarity_search_by_vector_with_relevance_scores(embed_query(db, query), k=k))
+
+    with _cache_lock:
+        cache[key] = results
+        if len(cache) > RETRIEVAL_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    return list(results)
+
+
+def retrieve(db, query: str, k=3):
+    """
+    Like retrieve_with_scores, returning only the documents
+    """
+    return [doc for doc, _ in retrieve_with_scores(db, query, k)]
+
+
+def _build_prompt(query: str, texts) -> str:
+    """
+    Build the prompt from retrieved chunks, skipping duplicates and stopping at the context budget
+    """
+    context_parts = []
+    seen = set()
+    total = 0
+    for text in texts:
+        key = hashlib.blake2b(text.encode(), digest_size=8).digest()
+        if key in seen:
+            continue
+        # The first chunk is always kept so an oversized one doesn't leave the context empty
+        if context_parts and total + len(text) > CONTEXT_CHAR_BUDGET:
+            break
+        seen.add(key)
+        context_parts.append(text)
+        total += len(text)
+
+    context = "\n".join(context_parts)
+    return f"Answer based on the context below:\n\n{context}\n\nQuery: {query}"
+
+
+def _stream_text(response):
     try:
-        docs = db.similarity_search(query, k=3)
-        context = "\n".join([doc.page_content for doc in docs])
+        for chunk in response:
+            yield chunk.text
+    except Exception as e:
+        raise RuntimeError(f"LLM query failed: {e}")
 
-        prompt = f"Answer based on the context below:\n\n{context}\n\nQuery: {query}"
 
-        llm = genai.GenerativeModel(model)
+def answer_query(db, query: str, model="gemini-2.5-flash", prefetched_docs=None, stream=False):
+    try:
+        # Reuse documents already retrieved by the caller instead of searching again
+        docs = prefetched_docs if prefetched_docs is not None else retrieve(db, query)
+        prompt = _build_prompt(query, (doc.page_content for doc in docs))
+
+        llm = get_llm(model)
+        if stream:
+            # Yield text as the model produces it instead of waiting for the full answer
+            return _stream_text(llm.generate_content(prompt, stream=True))
+
         response = llm.generate_content(prompt)
 
         return response.text
 
     except Exception as e:
         raise RuntimeError(f"LLM query failed: {e}")
+
+
+async def stream_answer(db, query: str, model="gemini-2.5-flash"):
+    """
+    Async generator yielding the answer as it arrives; retrieval runs in a worker thread
+    """
+    try:
+        docs = await asyncio.to_thread(retrieve, db, query)
+        prompt = _build_prompt(query, (doc.page_content for doc in docs))
+
+        response = await get_llm(model).generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+    except Exception as e:
+        raise RuntimeError(f"LLM query failed: {e}")
@@ -1,13 +1,93 @@
-from langchain_text_splitters import CharacterTextSplitter
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple
 
+# Chunks are measured in the embedder's own tokens, so each one fits its 256-token window untruncated
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-def split_text(text: str, chunk_size=1000, chunk_overlap=100):
-    try:
-        splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+
+
+def _split_buffer(
+    text: str, tokens_per_chunk: int, chunk_overlap: int, skip: int, final: bool
+) -> Tuple[List[str], int, int]:
+    """
+    Cut token windows from `text`, the first one starting at token `skip`.
+
+    Returns the chunks with where the next call resumes: the offset of a word start and the number of
+    that word's tokens to skip. Tokenizing from a word start reproduces the tokens of the whole text, so
+    windows land where a single pass would put them. Unless `final` is set, the last word may still grow,
+    so a window reaching into it is left for later.
+    """
+    encoding = _get_tokenizer()(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    # Character span of every token; chunks are sliced from the original text, keeping its case and spacing
+    offsets = encoding["offset_mapping"]
+    word_ids = encoding.word_ids()
+
+    # Windows may only use tokens before the last word while more text can follow
+    limit = len(offsets)
+    if not final:
+        while limit > 0 and word_ids[limit - 1] == word_ids[-1]:
+            limit -= 1
+
+    chunks = []
+    start = skip
+    while start < len(offsets):
+        end = min(start + tokens_per_chunk, len(offsets))
+
+        if end > limit:
+            # Resume at the start of the word holding this window's first token, never mid-word
+            word_start = start
+            while word_start > 0 and word_ids[word_start - 1] == word_ids[start]:
+                word_start -= 1
+            return chunks, offsets[word_start][0], start - word_start
+
+        chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end == len(offsets):
+            break
+
+        # The next window repeats the last chunk_overlap tokens of this one
+        start += tokens_per_chunk - chunk_overlap
+
+    return chunks, len(text), 0
+
+
+def split_stream(pieces: Iterable[str], tokens_per_chunk=200, chunk_overlap=20) -> Iterator[str]:
+    """
+    Split text arriving in pieces, holding only the unfinished tail in memory
+    """
+    if chunk_overlap >= tokens_per_chunk:
+        raise RuntimeError(
+            f"Text splitting failed: chunk_overlap ({chunk_overlap}) must be smaller than "
+            f"tokens_per_chunk ({tokens_per_chunk})"
         )
-        return splitter.split_text(text)
+
+    buffer = ""
+    skip = 0
+    for piece in pieces:
+        buffer += piece
+        try:
+            chunks, consumed, skip = _split_buffer(buffer, tokens_per_chunk, chunk_overlap, skip, final=False)
+        except Exception as e:
+            raise RuntimeError(f"Text splitting failed: {e}")
+
+        yield from chunks
+        buffer = buffer[consumed:]
+
+    try:
+        chunks, _, _ = _split_buffer(buffer, tokens_per_chunk, chunk_overlap, skip, final=True)
     except Exception as e:
         raise RuntimeError(f"Text splitting failed: {e}")
+
+    yield from chunks
+
+
+def split_text(text: str, tokens_per_chunk=200, chunk_overlap=20):
+    return list(split_stream([text], tokens_per_chunk, chunk_overlap))
@@ -1,29 +1,236 @@
+import hashlib
 import os
+from functools import lru_cache
 
 from langchain_chroma import Chroma
-from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
 # Disable ChromaDB telemetry
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Chunks per embedding forward pass during ingest
+EMBEDDING_BATCH_SIZE = 64
+GPU_EMBEDDING_BATCH_SIZE = 128
+
+# Tokens per input; matches the max_seq_length of all-MiniLM-L6-v2
+EMBEDDING_MAX_LENGTH = 256
+
+# HNSW index settings applied when a collection is created; cosine suits the normalized embeddings
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+# Records per Chroma add call; stays below the client's maximum batch size
+ADD_BATCH_SIZE = 5000
+
+# Written next to the Chroma files; identifies the chunks and model the store was built from
+FINGERPRINT_FILE = "fingerprint.txt"
+
+# Exported/quantized models are stored under <project root>/models by default
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    MiniLM exported to ONNX and run by ONNX Runtime with all graph optimizations enabled,
+    optionally with INT8 dynamically quantized MatMul weights.
+
+    The export and quantization run once and are cached on disk. Outputs are mean-pooled
+    and L2-normalized, matching the sentence-transformers pipeline of the FP32 model.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, cache_dir: str = MODELS_DIR, quantize: bool = False):
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__") + ("-onnx-int8" if quantize else "-onnx"))
+        file_name = "model_quantized.onnx" if quantize else "model.onnx"
+
+        if not os.path.exists(os.path.join(model_dir, file_name)):
+            ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+            if quantize:
+                quantize_dynamic(
+                    model_input=os.path.join(model_dir, "model.onnx"),
+                    model_output=os.path.join(model_dir, file_name),
+                    op_types_to_quantize=["MatMul"],
+                    weight_type=QuantType.QInt8,
+                )
+
+        # Fuses attention, LayerNorm and GELU subgraphs when the session is created
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        # Dynamically quantized MatMuls only have CPU kernels
+        if not quantize and "CUDAExecutionProvider" in ort.get_available_providers():
+            provider = "CUDAExecutionProvider"
+        else:
+            provider = "CPUExecutionProvider"
+
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, file_name=file_name, session_options=session_options, provider=provider
+        )
+
+    def _embed(self, texts):
+        import numpy as np
+
+        inputs = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=EMBEDDING_MAX_LENGTH, return_tensors="np"
+        )
+        hidden = self._model(**inputs).last_hidden_state
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+        return pooled.tolist()
+
+    def embed_documents(self, texts):
+        # Length-sorted batches so each one pads only to its own longest text
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+
+        for start in range(0, len(order), EMBEDDING_BATCH_SIZE):
+            batch = order[start:start + EMBEDDING_BATCH_SIZE]
+            for i, vector in zip(batch, self._embed([texts[i] for i in batch])):
+                embeddings[i] = vector
+
+        return embeddings
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
+
+
+class CT2Embeddings(Embeddings):
+    """
+    MiniLM served by CTranslate2: int8_float16 on GPU, int8 on CPU.
+    """
+
+    def __init__(self, model_name: str = "michaelfeil/ct2fast-all-MiniLM-L6-v2"):
+        import ctranslate2
+        from hf_hub_ctranslate2 import CT2SentenceTransformer
+
+        cuda = ctranslate2.get_cuda_device_count() > 0
+
+        self.model_name = model_name
+        self._model = CT2SentenceTransformer(
+            model_name_or_path=model_name,
+            device="cuda" if cuda else "cpu",
+            compute_type="int8_float16" if cuda else "int8",
+        )
+
+    def embed_documents(self, texts):
+        vectors = self._model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def create_embedding_model():
+    """
+    Build the embedding model selected by the EMBEDDING_BACKEND environment variable
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "huggingface")
+
+    if backend == "huggingface":
+        import torch
+
+        if torch.cuda.is_available():
+            # FP16 on GPU roughly doubles throughput with larger batches
+            device, dtype, batch_size = "cuda", torch.float16, GPU_EMBEDDING_BATCH_SIZE
+        else:
+            device, dtype, batch_size = "cpu", torch.float32, EMBEDDING_BATCH_SIZE
+            torch.set_num_threads(os.cpu_count())
+
+        # Chroma embeds all chunks in one embed_documents call, and sentence-transformers
+        # length-sorts its input before batching, so each batch pads only to its own longest chunk
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={"device": device, "model_kwargs": {"torch_dtype": dtype}},
+            encode_kwargs={"batch_size": batch_size, "normalize_embeddings": True, "convert_to_numpy": True}
+        )
+    if backend == "onnx":
+        return OnnxEmbeddings()
+    if backend == "onnx-int8":
+        return OnnxEmbeddings(quantize=True)
+    if backend == "ctranslate2":
+        return CT2Embeddings()
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """
+    Return the process-wide embedding model, loading its weights only once
+    """
+    return create_embedding_model()
+
+
+def _fingerprint(chunks, embedding_model) -> str:
+    """
+    Identify a set of chunks embedded with a given model
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(os.getenv("EMBEDDING_BACKEND", "huggingface").encode())
+    digest.update(getattr(embedding_model, "model_name", "").encode())
+    digest.update(repr(sorted(COLLECTION_METADATA.items())).encode())
+    for chunk in chunks:
+        digest.update(b"\0")
+        digest.update(chunk.encode())
+    return digest.hexdigest()
+
 
 def create_vectorstore(chunks, persist_dir):
     if not chunks:
         raise ValueError("No text chunks provided.")
 
     try:
-        documents = [Document(page_content=chunk) for chunk in chunks]
-        embedding_model = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        embedding_model = get_embedder()
+
+        # Reuse the persisted store when it was built from exactly these chunks and model
+        fingerprint = _fingerprint(chunks, embedding_model)
+        fingerprint_path = os.path.join(persist_dir, FINGERPRINT_FILE)
+        if os.path.exists(os.path.join(persist_dir, "chroma.sqlite3")) and os.path.exists(fingerprint_path):
+            with open(fingerprint_path) as f:
+                if f.read().strip() == fingerprint:
+                    return Chroma(persist_directory=persist_dir, embedding_function=embedding_model)
+
+        # Drop the old fingerprint first, so a build that fails part-way is never reused as complete
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
 
-        vectordb = Chroma.from_documents(
-            documents=documents,
-            embedding=embedding_model,
-            persist_directory=persist_dir
+        # Start from an empty collection so stale chunks from a previous build don't linger
+        Chroma(persist_directory=persist_dir, embedding_function=embedding_model).delete_collection()
+
+        vectordb = Chroma(
+            persist_directory=persist_dir,
+            embedding_function=embedding_model,
+            collection_metadata=COLLECTION_METADATA
         )
 
+        # Embed everything in one batched call, then bulk-add with the precomputed vectors
+        embeddings = embedding_model.embed_documents(chunks)
+        ids = [f"c{i}" for i in range(len(chunks))]
+        for start in range(0, len(chunks), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            vectordb._collection.add(ids=ids[start:end], documents=chunks[start:end], embeddings=embeddings[start:end])
+
+        with open(fingerprint_path, "w") as f:
+            f.write(fingerprint)
+
         return vectordb
 
     except Exception as e:
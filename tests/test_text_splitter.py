@@ -0,0 +1,64 @@
+import random
+import re
+import unittest
+from unittest import mock
+
+from src import text_splitter
+
+
+class _Encoding(dict):
+    def __init__(self, offsets, word_ids):
+        super().__init__(offset_mapping=offsets)
+        self._word_ids = word_ids
+
+    def word_ids(self):
+        return self._word_ids
+
+
+class _SubwordTokenizer:
+    """
+    Stand-in for a WordPiece tokenizer: each word starts with a two-character piece followed
+    by three-character continuations, so tokenizing from the middle of a word gives different pieces
+    """
+
+    def __call__(self, text, **kwargs):
+        offsets, word_ids = [], []
+        for word_id, match in enumerate(re.finditer(r"\w+|[^\w\s]", text)):
+            start = match.start()
+            size = 2
+            while start < match.end():
+                offsets.append((start, min(start + size, match.end())))
+                word_ids.append(word_id)
+                start += size
+                size = 3
+        return _Encoding(offsets, word_ids)
+
+
+class SplitStreamTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(text_splitter, "_get_tokenizer", _SubwordTokenizer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _random_text(self, rng):
+        words = ["a", "token", "splitting", "embeddings", ".", ",", "x1", "retrieval\n", "augmented\n\n"]
+        return " ".join(rng.choice(words) for _ in range(rng.randint(0, 400)))
+
+    def test_stream_matches_single_pass(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            text = self._random_text(rng)
+            # Cut anywhere, including mid-word
+            cuts = sorted(rng.sample(range(len(text) + 1), min(8, len(text) + 1)))
+            pieces = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+            expected = text_splitter.split_text(text, 20, 5)
+            self.assertEqual(list(text_splitter.split_stream(pieces, 20, 5)), expected)
+
+    def test_overlap_must_be_smaller_than_chunk(self):
+        with self.assertRaises(RuntimeError):
+            text_splitter.split_text("text", 10, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()